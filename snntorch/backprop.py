@@ -1,11 +1,399 @@
 import snntorch as snn
 import torch
+import torch.nn as nn
 from snntorch import utils
 from snntorch import functional as SF
 
 
-# consider turning into a class s.t. dictionary params can be parsed at __init__
-# and never touched again
+class TBPTTTrainer:
+    """Truncated backpropagation through time, with the per-network setup performed once.
+    Criterion & regularization dispatch, the scan for neuron types, the static-prefix split, compilation and mixed precision are resolved at construction, and each call to :meth:`train_epoch` only runs the training loop.
+    LIF layers require parameter ``init_hidden = True``.
+
+    Example::
+
+        import snntorch as snn
+        import snntorch.functional as SF
+        from snntorch import backprop
+        import torch
+        import torch.nn as nn
+
+        lif1 = snn.Leaky(beta=0.9, init_hidden=True)
+        lif2 = snn.Leaky(beta=0.9, init_hidden=True, output=True)
+
+        net = nn.Sequential(nn.Flatten(),
+                            nn.Linear(784,500),
+                            lif1,
+                            nn.Linear(500, 10),
+                            lif2).to(device)
+
+        optimizer = torch.optim.Adam(net.parameters(), lr=5e-4, betas=(0.9, 0.999))
+        trainer = backprop.TBPTTTrainer(net, num_steps=100, criterion=SF.mse_count_loss(),
+        time_var=False, device=device, K=40)
+
+        # train_loader is of type torch.utils.data.DataLoader
+        for epoch in range(5):
+            loss = trainer.train_epoch(train_loader, optimizer)
+
+    :param net: Network model (either wrapped in Sequential container or as a class)
+    :type net: torch.nn.modules.container.Sequential
+
+    :param num_steps: Number of time steps
+    :type num_steps: int
+
+    :param criterion: Loss criterion from snntorch.functional, e.g., snn.functional.mse_count_loss()
+    :type criterion: snn.functional.LossFunctions
+
+    :param time_var: Set to ``True`` if input data is time-varying [T x B x dims]. Otherwise, set to false if input data is time-static [B x dims].
+    :type time_var: Bool
+
+    :param regularization: Option to add a regularization term to the loss function
+    :type regularization: snn.functional regularization function, optional
+
+    :param device: Specify either "cuda" or "cpu", defaults to "cpu"
+    :type device: string, optional
+
+    :param K: Number of time steps to process per weight update, defaults to ``1``
+    :type K: int, optional
+
+    :param ddp: Set to ``True`` if ``net`` is wrapped in ``torch.nn.parallel.DistributedDataParallel``. See :func:`TBPTT`, defaults to ``False``
+    :type ddp: bool, optional
+
+    :param compile: Set to ``True`` to compile ``net`` with ``torch.compile``. See :func:`TBPTT`, defaults to ``False``
+    :type compile: bool, optional
+
+    :param amp: Set to ``True`` to run the forward pass and criterion under automatic mixed precision. See :func:`TBPTT`. The gradient scaler is kept across calls to :meth:`train_epoch`, defaults to ``False``
+    :type amp: bool, optional
+    """
+
+    def __init__(
+        self,
+        net,
+        num_steps,  # must be specified in case data in is static
+        criterion,
+        time_var,  # specifies if data is time_varying
+        regularization=False,
+        device="cpu",
+        K=1,
+        ddp=False,
+        compile=False,
+        amp=False,
+    ):
+        if K > num_steps:
+            raise ValueError("K must be less than or equal to num_steps.")
+
+        self.neuron_types = utils._neuron_types(net)
+        (
+            self.loss_spk,
+            self.time_var_targets,
+            reg_spk,
+            loss_count,
+            reg_count,
+        ) = _criterion_flags(criterion, regularization)
+
+        # only record the outputs needed by criterion & regularization
+        self.rec_spk = self.loss_spk or (bool(regularization) and reg_spk)
+        self.rec_mem = not self.loss_spk or (bool(regularization) and not reg_spk)
+
+        # if every use of spk only depends on the spike count,
+        # a running sum replaces the per-step spk recording
+        self.count_spk = (
+            self.rec_spk
+            and (loss_count or not self.loss_spk)
+            and (reg_count or not (bool(regularization) and reg_spk))
+        )
+
+        if ddp:
+            if not isinstance(net, torch.nn.parallel.DistributedDataParallel):
+                raise TypeError(
+                    "``net`` must be wrapped in ``torch.nn.parallel.DistributedDataParallel`` when ``ddp=True``."
+                )
+            module = net.module  # inspect the wrapped network, but run the forward pass through DDP
+        else:
+            module = net
+
+        self.num_return = utils._final_layer_check(module)  # number of outputs
+
+        self.net = net.to(device)
+        self.num_steps = num_steps
+        self.time_var = time_var
+        self.device = device
+        self.K = K
+        self.ddp = ddp
+
+        # for time-static data, the layers ahead of the first neuron are evaluated once per window
+        prefix, model = None, self.net
+        if not time_var and not ddp:
+            prefix, model = _split_static(self.net)
+
+        if compile:
+            if not hasattr(torch, "compile"):
+                raise RuntimeError("``compile=True`` requires PyTorch 2.0 or later.")
+            # layers are inspected above as the compiled wrapper hides them.
+            # CUDA graphs (mode="reduce-overhead") are not used: each replay overwrites
+            # the previous step's outputs, which the hidden states, the per-window
+            # recordings and the graph of the current window still refer to.
+            model = torch.compile(model)
+
+        # loop-invariant dispatch is resolved once here rather than at every step
+        self.forward_fn = _make_forward(model, self.num_return, time_var)
+        self.static_fn = prefix if prefix is not None else lambda data: data
+        self.loss_fn = _make_loss(
+            criterion, self.loss_spk, self.time_var_targets, self.count_spk
+        )
+        self.reg_fn = _make_reg(regularization, reg_spk)
+
+        device_type = torch.device(device).type
+        self.scaler = None
+        if amp:
+            if not hasattr(torch, "autocast"):
+                raise RuntimeError("``amp=True`` requires PyTorch 1.10 or later.")
+            self.forward_fn = _autocast(self.forward_fn, device_type)
+            self.static_fn = _autocast(self.static_fn, device_type)
+            self.loss_fn = _autocast(self.loss_fn, device_type)
+            self.reg_fn = _autocast(self.reg_fn, device_type)
+            if device_type == "cuda":  # float16 gradients are scaled to avoid underflow
+                if hasattr(torch, "amp") and hasattr(torch.amp, "GradScaler"):
+                    self.scaler = torch.amp.GradScaler("cuda")
+                else:  # PyTorch < 2.3
+                    self.scaler = torch.cuda.amp.GradScaler()
+
+    def train_epoch(self, dataloader, optimizer):
+        """Trains ``net`` for one epoch.
+
+        :param dataloader: DataLoader containing data and targets. When training on CUDA, set ``pin_memory=True`` so the next batch is copied to the device while the current batch is processed.
+        :type dataloader: torch.utils.data.DataLoader
+
+        :param optimizer: Optimizer used, e.g., torch.optim.adam.Adam
+        :type optimizer: torch.optim
+
+        :return: return average loss for one epoch
+        :rtype: float
+        """
+
+        if self.ddp and not isinstance(
+            getattr(dataloader, "sampler", None),
+            torch.utils.data.distributed.DistributedSampler,
+        ):
+            raise TypeError(
+                "``dataloader`` must use a ``torch.utils.data.distributed.DistributedSampler`` when ``ddp=True``."
+            )
+
+        # locals are faster to look up than attributes inside the loop
+        net, neuron_types, K = self.net, self.neuron_types, self.K
+        forward_fn, static_fn = self.forward_fn, self.static_fn
+        loss_fn, reg_fn, scaler = self.loss_fn, self.reg_fn, self.scaler
+        rec_spk, rec_mem, count_spk = self.rec_spk, self.rec_mem, self.count_spk
+        spk_rec_trunc = mem_rec_trunc = None
+
+        step_trunc = 0  # ranges from 0 to K, resetting every K time steps
+        last_step = self.num_steps - 1
+        step_weight = 1.0 / self.num_steps  # each window's loss is weighted by its share of num_steps
+        # summed on the device so the host only waits on the loss once per epoch
+        loss_avg = torch.zeros((), device=self.device)
+        num_batches = 0
+
+        for num_batches, (data, targets) in enumerate(
+            _prefetch(dataloader, self.device), 1
+        ):
+            net.train()
+
+            for neuron in neuron_types:
+                neuron.reset_hidden()
+            K_count = 0
+
+            # slice time-varying data and targets once per batch rather than at every step
+            if self.time_var:
+                data = data.unbind(0)
+            if self.time_var_targets:
+                targets = targets.split(K)
+
+            for step in range(self.num_steps):
+                # weights change every window, so the static prefix is re-run once per window
+                if step_trunc == 0:
+                    cur = static_fn(data)
+                spk, mem = forward_fn(cur, step)
+
+                if count_spk:
+                    spk_rec_trunc = spk if step_trunc == 0 else spk_rec_trunc + spk
+                elif rec_spk:
+                    if step_trunc == 0:
+                        spk_rec_trunc = []
+                    spk_rec_trunc.append(spk)
+                if rec_mem:
+                    if step_trunc == 0:
+                        mem_rec_trunc = []
+                    mem_rec_trunc.append(mem)
+
+                step_trunc += 1
+                # the final window is shorter than K if K does not divide num_steps
+                if step_trunc == K or step == last_step:
+                    loss = _finalize_window(
+                        spk_rec_trunc,
+                        mem_rec_trunc,
+                        step_trunc,
+                        targets,
+                        K_count,
+                        loss_fn,
+                        reg_fn,
+                        count_spk,
+                    )
+
+                    optimizer.zero_grad(set_to_none=True)
+                    if scaler is None:
+                        loss.backward()
+                        optimizer.step()
+                    else:
+                        scaler.scale(loss).backward()
+                        scaler.step(optimizer)
+                        scaler.update()
+
+                    # detached so the epoch does not hold on to each window's graph;
+                    # summed as some criteria return a [1] tensor rather than a scalar
+                    loss_avg += loss.detach().sum() * (step_trunc * step_weight)
+
+                    for neuron in neuron_types:
+                        neuron.detach_hidden()
+
+                    K_count += 1
+                    step_trunc = 0
+
+        # averaged over batches
+        return loss_avg.item() / max(num_batches, 1)
+
+
+class BPTFTrainer(TBPTTTrainer):
+    """Backpropagation to the future, with the per-network setup performed once.
+    See :func:`BPTF` for a description of the algorithm. LIF layers require parameter ``init_hidden = True``.
+
+    Example::
+
+        trainer = backprop.BPTFTrainer(net, num_steps=100, criterion=SF.mse_count_loss(),
+        time_var=False, device=device, K=1)
+
+        # train_loader is of type torch.utils.data.DataLoader
+        for epoch in range(5):
+            loss = trainer.train_epoch(train_loader, optimizer)
+
+    :param net: Network model (either wrapped in Sequential container or as a class)
+    :type net: torch.nn.modules.container.Sequential
+
+    :param num_steps: Number of time steps
+    :type num_steps: int
+
+    :param criterion: Loss criterion from snntorch.functional, e.g., snn.functional.mse_count_loss()
+    :type criterion: snn.functional.LossFunctions
+
+    :param time_var: Set to ``True`` if input data is time-varying [T x B x dims]. Otherwise, set to false if input data is time-static [B x dims].
+    :type time_var: Bool
+
+    :param regularization: Option to add a regularization term to the loss function
+    :type regularization: snn.functional regularization function, optional
+
+    :param device: Specify either "cuda" or "cpu", defaults to "cpu"
+    :type device: string, optional
+
+    :param K: Number of time steps to process per weight update, defaults to ``1``
+    :type K: int, optional
+    """
+
+    def __init__(
+        self,
+        net,
+        num_steps,  # must be specified in case data in is static
+        criterion,
+        time_var,  # specifies if data is time_varying
+        regularization=False,
+        device="cpu",
+        K=1,
+    ):
+        super().__init__(
+            net, num_steps, criterion, time_var, regularization, device, K
+        )
+
+        # the graph is freed every step, so the full network runs at every step
+        # and the loss is computed from a single step of spk & mem
+        self.forward_fn = _make_forward(self.net, self.num_return, time_var)
+        self.loss_fn = _make_loss(criterion, self.loss_spk, self.time_var_targets)
+        self.leaky_params = _leaky_params(self.net)
+
+    def train_epoch(self, dataloader, optimizer):
+        """Trains ``net`` for one epoch.
+
+        :param dataloader: DataLoader containing data and targets
+        :type dataloader: torch.utils.data.DataLoader
+
+        :param optimizer: Optimizer used, e.g., torch.optim.adam.Adam
+        :type optimizer: torch.optim
+
+        :return: return average loss for one epoch
+        :rtype: float
+        """
+
+        # locals are faster to look up than attributes inside the loop
+        net, neuron_types, K = self.net, self.neuron_types, self.K
+        forward_fn, loss_fn, reg_fn = self.forward_fn, self.loss_fn, self.reg_fn
+
+        step_trunc = 0  # ranges from 0 to K, resetting every K time steps
+        last_step = self.num_steps - 1
+        step_weight = 1.0 / self.num_steps
+        # summed on the device so the host only waits on the loss once per epoch
+        loss_avg = torch.zeros((), device=self.device)
+        num_batches = 0
+
+        for num_batches, (data, targets) in enumerate(
+            _prefetch(dataloader, self.device), 1
+        ):
+            net.train()
+
+            for neuron in neuron_types:
+                neuron.reset_hidden()
+
+            # each time step is its own window for time-varying targets
+            if self.time_var:
+                data = data.unbind(0)
+            if self.time_var_targets:
+                targets = targets.split(1)  # criterion expects a leading time dimension
+
+            # read once per batch in case beta is learnable.
+            # a per-neuron beta is approximated by its mean over the layer
+            leak = [
+                (params, float(neuron.beta.detach().clamp(0, 1).mean()))
+                for params, neuron in self.leaky_params
+            ]
+            optimizer.zero_grad(set_to_none=True)
+
+            for step in range(self.num_steps):
+                spk, mem = forward_fn(data, step)
+
+                # criterion expects a leading time dimension
+                spk, mem = spk.unsqueeze(0), mem.unsqueeze(0)
+                loss = loss_fn(spk, mem, targets, step, 1) + reg_fn(spk, mem)
+
+                # gradients from previous time steps are carried forward, scaled by the leaky rate
+                for params, beta in leak:
+                    for param in params:
+                        if param.grad is not None:
+                            param.grad.mul_(beta)
+
+                # the hidden states are detached every step, so only one step of graph is held
+                loss.backward()
+
+                for neuron in neuron_types:
+                    neuron.detach_hidden()
+
+                loss_avg += loss.detach().sum()  # some criteria return a [1] tensor
+
+                step_trunc += 1
+                if step_trunc == K or step == last_step:
+                    optimizer.step()
+                    optimizer.zero_grad(set_to_none=True)
+                    step_trunc = 0
+
+        # averaged over batches
+        return loss_avg.item() * step_weight / max(num_batches, 1)
+
+
 def TBPTT(
     net,
     dataloader,
@@ -16,6 +404,9 @@ def TBPTT(
     regularization=False,
     device="cpu",
     K=1,
+    ddp=False,
+    compile=False,
+    amp=False,
 ):
     """Truncated backpropagation through time. LIF layers require parameter ``init_hidden = True``.
     Weight updates are performed every ``K`` time steps.
@@ -48,14 +439,14 @@ def TBPTT(
         # train_loader is of type torch.utils.data.DataLoader
         # backprop is automatically applied every K=40 time steps
         for epoch in range(5):
-            loss, spk, mem = backprop.TBPTT(net, train_loader, num_steps=num_steps,
+            loss = backprop.TBPTT(net, train_loader, num_steps=num_steps,
             optimizer=optimizer, criterion=loss_fn, regularization=reg_fn, device=device, K=40)
 
 
     :param net: Network model (either wrapped in Sequential container or as a class)
     :type net: torch.nn.modules.container.Sequential
 
-    :param dataloader: DataLoader containing data and targets
+    :param dataloader: DataLoader containing data and targets. When training on CUDA, set ``pin_memory=True`` so the next batch is copied to the device while the current batch is processed.
     :type dataloader: torch.utils.data.DataLoader
 
     :param num_steps: Number of time steps
@@ -79,225 +470,31 @@ def TBPTT(
     :param K: Number of time steps to process per weight update, defaults to ``1``
     :type K: int, optional
 
-    :return: return average loss for one epoch
-    :rtype: torch.Tensor
-
-    :return: return output spikes over time
-    :rtype: torch.Tensor
-
-    :return: return output membrane potential trace over time
-    :rtype: torch.Tensor
-    """
+    :param ddp: Set to ``True`` if ``net`` is wrapped in ``torch.nn.parallel.DistributedDataParallel`` for multi-GPU training. ``dataloader`` must then use a ``torch.utils.data.distributed.DistributedSampler``, and one process is launched per GPU, e.g., ``torchrun --nproc_per_node=N train.py``. Gradients are all-reduced across processes during each backward pass, defaults to ``False``
+    :type ddp: bool, optional
 
-    if K > num_steps:
-        raise ValueError("K must be less than or equal to num_steps.")
+    :param compile: Set to ``True`` to compile ``net`` with ``torch.compile``, fusing the layers of each time step into fewer kernels. Requires PyTorch 2.0 or later, defaults to ``False``
+    :type compile: bool, optional
 
-    # triggers global variables is_lapicque etc for neurons_dict
-    # redo reset in training loop
-    utils.reset(net=net)
+    :param amp: Set to ``True`` to run the forward pass and criterion under automatic mixed precision, i.e., ``float16`` with gradient scaling on CUDA and ``bfloat16`` on CPU. Requires PyTorch 1.10 or later. The gradient scale is re-learned on every call, so use :class:`TBPTTTrainer` to keep it across epochs, defaults to ``False``
+    :type amp: bool, optional
 
-    neurons_dict = {  # confirm this is even useful
-        utils.is_lapicque: snn.Lapicque,
-        utils.is_leaky: snn.Leaky,
-        utils.is_synaptic: snn.Synaptic,
-        utils.is_alpha: snn.Alpha,
-        utils.is_stein: snn.Stein,
-    }
-
-    # element 1: if true: spk, if false, mem
-    # element 2: if true: time_varying_targets
-
-    criterion_dict = {
-        "mse_membrane_loss": [
-            False,
-            True,
-        ],  # if time_var_target is true, need a flag to let mse_mem_loss know when to re-start iterating targets from
-        "ce_max_membrane_loss": [False, False],
-        "ce_rate_loss": [True, False],
-        "ce_count_loss": [True, False],
-        "mse_count_loss": [True, False],
-    }  # note: when using mse_count_loss, the target spike-count should be for a truncated time, not for the full time
-
-    reg_dict = {"l1_rate_sparsity": True}
-
-    # acc_dict = {
-    #     SF.accuracy_rate : [False, False, False, True]
-    # }
-
-    time_var_targets = False
-    counter = len(criterion_dict)
-    for criterion_key in criterion_dict:
-        if criterion_key == criterion.__name__:
-            loss_spk, time_var_targets = criterion_dict[
-                criterion_key
-            ]  # m: mem, s: spk // s: every step, e: end
-            if time_var_targets:
-                time_var_targets = criterion.time_var_targets  # check this
-        counter -= 1
-    if counter:  # fix the print statement
-        raise TypeError(
-            "``criterion`` must be one of the loss functions in ``snntorch.functional``: e.g., 'mse_membrane_loss', 'ce_max_membrane_loss', 'ce_rate_loss' etc."
-        )
-
-    if regularization:
-        for reg_item in reg_dict:
-            if reg_item == regularization.__name__:
-                reg_spk = reg_dict[reg_item]  # m: mem, s: spk // s: every step, e: end
-
-    num_return = utils._final_layer_check(net)  # number of outputs
-
-    step_trunc = 0  # ranges from 0 to K, resetting every K time steps
-    K_count = 0
-    loss_trunc = 0  # reset every K time steps
-    loss_avg = 0
-
-    #mem_rec = []
-    #spk_rec = []
-    mem_rec_trunc = []
-    spk_rec_trunc = []
-
-    net = net.to(device)
-
-    data_iterator = iter(dataloader)
-    for data, targets in data_iterator:
-        net.train()
-        data = data.to(device)
-        targets = targets.to(device)
-
-        utils.reset(net)
-
-        for step in range(num_steps):
-            if num_return == 2:
-                if time_var:
-                    spk, mem = net(data[step])
-                else:
-                    spk, mem = net(data)
-
-            elif num_return == 3:
-                if time_var:
-                    spk, _, mem = net(data[step])
-                else:
-                    spk, _, mem = net(data)
-
-            elif num_return == 4:
-                if time_var:
-                    spk, _, _, mem = net(data[step])
-                else:
-                    spk, _, _, mem = net(data)
-
-            # else:  # assume not an snn.Layer returning 1 val
-            #     if time_var:
-            #         spk = net(data[step])
-            #     else:
-            #         spk = net(data)
-            #     spk_rec.append(spk)
-
-            spk_rec_trunc.append(spk)
-            mem_rec_trunc.append(mem)
-
-            step_trunc += 1
-            if step_trunc == K:
-                #spk_rec += spk_rec_trunc
-                #mem_rec += mem_rec_trunc
-
-                spk_rec_trunc = torch.stack(spk_rec_trunc, dim=0)
-                mem_rec_trunc = torch.stack(mem_rec_trunc, dim=0)
-
-                # loss_spk is True if input to criterion is spk;
-                # reg_spk is True if input to reg is spk
-
-                # catch case for time_varying_targets?
-                if time_var_targets:
-                    if loss_spk:
-                        loss = criterion(
-                            spk_rec_trunc,
-                            targets[int(K_count * K) : int((K_count + 1) * K)],
-                        )
-                    else:
-                        loss = criterion(
-                            mem_rec_trunc,
-                            targets[int(K_count * K) : int((K_count + 1) * K)],
-                        )
-                else:
-                    if loss_spk:
-                        loss = criterion(spk_rec_trunc, targets)
-                    else:
-                        loss = criterion(mem_rec_trunc, targets)
-
-                if regularization:
-                    if reg_spk:
-                        loss += regularization(spk_rec_trunc)
-                    else:
-                        loss += regularization(mem_rec_trunc)
-
-                loss_trunc += loss
-                loss_avg += loss / (num_steps / K)
-
-                optimizer.zero_grad()
-                loss_trunc.backward()
-                optimizer.step()
-
-                for neuron in neurons_dict:
-                    if neuron:
-                        neurons_dict[
-                            neuron
-                        ].detach_hidden()  # might need to swap detach_hidden --> _reset_hidden
-
-                K_count += 1
-                step_trunc = 0
-                loss_trunc = 0
-                spk_rec_trunc = []
-                mem_rec_trunc = []
-
-        if (step == num_steps - 1) and (num_steps % K):
-            #spk_rec += spk_rec_trunc
-            #mem_rec += mem_rec_trunc
-
-            spk_rec_trunc = torch.stack(spk_rec_trunc, dim=0)
-            mem_rec_trunc = torch.stack(mem_rec_trunc, dim=0)
-
-            if time_var_targets:
-                if loss_spk:
-                    loss = criterion(
-                        spk_rec_trunc,
-                        targets[int(K_count * K) : int(K_count * K + num_steps % K)],
-                    )
-                else:
-                    loss = criterion(
-                        mem_rec_trunc,
-                        targets[int(K_count * K) : int(K_count * K + num_steps % K)],
-                    )
-            else:
-                if loss_spk:
-                    loss = criterion(spk_rec_trunc, targets)
-                else:
-                    loss = criterion(mem_rec_trunc, targets)
-
-            if regularization:
-                if reg_spk:
-                    loss += regularization(spk_rec_trunc)
-                else:
-                    loss += regularization(mem_rec_trunc)
-
-            loss_trunc += loss
-            loss_avg += loss / int(num_steps % K)
-
-            optimizer.zero_grad()
-            loss_trunc.backward()
-            optimizer.step()
-
-            K_count = 0
-            step_trunc = 0
-            loss_trunc = 0
-            spk_rec_trunc = []
-            mem_rec_trunc = []
-
-            for neuron in neurons_dict:
-                if neuron:
-                    neurons_dict[neuron].detach_hidden()
+    :return: return average loss for one epoch
+    :rtype: float
+    """
 
-    #return loss_avg, spk_rec, mem_rec
-    return loss_avg
+    return TBPTTTrainer(
+        net,
+        num_steps,
+        criterion,
+        time_var,
+        regularization,
+        device,
+        K,
+        ddp=ddp,
+        compile=compile,
+        amp=amp,
+    ).train_epoch(dataloader, optimizer)
 
 
 def BPTT(
@@ -309,6 +506,9 @@ def BPTT(
     time_var,  # add to doc_strings - specifies if data is time_varying
     regularization=False,
     device="cpu",
+    ddp=False,
+    compile=False,
+    amp=False,
 ):
     """Backpropagation through time. LIF layers require parameter ``init_hidden = True``.
     A forward pass is applied for each time step while the loss accumulates. The backward pass and parameter update is only applied at the end of each time step sequence.
@@ -342,7 +542,7 @@ def BPTT(
         # train_loader is of type torch.utils.data.DataLoader
         # backprop is automatically applied every K=40 time steps
         for epoch in range(5):
-            loss, spk, mem = backprop.BPTT(net, train_loader, num_steps=num_steps,
+            loss = backprop.BPTT(net, train_loader, num_steps=num_steps,
             optimizer=optimizer, criterion=loss_fn, regularization=reg_fn, device=device)
 
 
@@ -370,14 +570,17 @@ def BPTT(
     :param device: Specify either "cuda" or "cpu", defaults to "cpu"
     :type device: string, optional
 
-    :return: return average loss for one epoch
-    :rtype: torch.Tensor
+    :param ddp: Set to ``True`` if ``net`` is wrapped in ``torch.nn.parallel.DistributedDataParallel`` for multi-GPU training. ``dataloader`` must then use a ``torch.utils.data.distributed.DistributedSampler``, and one process is launched per GPU, e.g., ``torchrun --nproc_per_node=N train.py``. Gradients are all-reduced across processes during each backward pass, defaults to ``False``
+    :type ddp: bool, optional
+
+    :param compile: Set to ``True`` to compile ``net`` with ``torch.compile``, fusing the layers of each time step into fewer kernels. Requires PyTorch 2.0 or later, defaults to ``False``
+    :type compile: bool, optional
 
-    :return: return output spikes over time
-    :rtype: torch.Tensor
+    :param amp: Set to ``True`` to run the forward pass and criterion under automatic mixed precision, i.e., ``float16`` with gradient scaling on CUDA and ``bfloat16`` on CPU. Requires PyTorch 1.10 or later. The gradient scale is re-learned on every call, so use :class:`TBPTTTrainer` to keep it across epochs, defaults to ``False``
+    :type amp: bool, optional
 
-    :return: return output membrane potential trace over time
-    :rtype: torch.Tensor
+    :return: return average loss for one epoch
+    :rtype: float
     """
 
     #  Net requires hidden instance variables rather than global instance variables for TBPTT
@@ -391,6 +594,9 @@ def BPTT(
         regularization,
         device,
         K=num_steps,
+        ddp=ddp,
+        compile=compile,
+        amp=amp,
     )
 
 
@@ -403,6 +609,9 @@ def RTRL(
     time_var,  # specifies if data is time_varying
     regularization=False,
     device="cpu",
+    ddp=False,
+    compile=False,
+    amp=False,
 ):
 
     """Real-time Recurrent Learning. LIF layers require parameter ``init_hidden = True``.
@@ -437,7 +646,7 @@ def RTRL(
         # train_loader is of type torch.utils.data.DataLoader
         # backprop is automatically applied every K=40 time steps
         for epoch in range(5):
-            loss, spk, mem = backprop.RTRL(net, train_loader, num_steps=num_steps,
+            loss = backprop.RTRL(net, train_loader, num_steps=num_steps,
             optimizer=optimizer, criterion=loss_fn, regularization=reg_fn, device=device)
 
 
@@ -468,14 +677,17 @@ def RTRL(
     :param K: Number of time steps to process per weight update, defaults to ``1``
     :type K: int, optional
 
-    :return: return average loss for one epoch
-    :rtype: torch.Tensor
+    :param ddp: Set to ``True`` if ``net`` is wrapped in ``torch.nn.parallel.DistributedDataParallel`` for multi-GPU training. ``dataloader`` must then use a ``torch.utils.data.distributed.DistributedSampler``, and one process is launched per GPU, e.g., ``torchrun --nproc_per_node=N train.py``. Gradients are all-reduced across processes during each backward pass, defaults to ``False``
+    :type ddp: bool, optional
 
-    :return: return output spikes over time
-    :rtype: torch.Tensor
+    :param compile: Set to ``True`` to compile ``net`` with ``torch.compile``, fusing the layers of each time step into fewer kernels. Requires PyTorch 2.0 or later, defaults to ``False``
+    :type compile: bool, optional
 
-    :return: return output membrane potential trace over time
-    :rtype: torch.Tensor
+    :param amp: Set to ``True`` to run the forward pass and criterion under automatic mixed precision, i.e., ``float16`` with gradient scaling on CUDA and ``bfloat16`` on CPU. Requires PyTorch 1.10 or later. The gradient scale is re-learned on every call, so use :class:`TBPTTTrainer` to keep it across epochs, defaults to ``False``
+    :type amp: bool, optional
+
+    :return: return average loss for one epoch
+    :rtype: float
     """
 
     return TBPTT(
@@ -488,6 +700,9 @@ def RTRL(
         regularization,
         device,
         K=1,
+        ddp=ddp,
+        compile=compile,
+        amp=amp,
     )
 
 
@@ -504,6 +719,9 @@ def BPTF(
 ):
     """Backpropagation to the future. LIF layers require parameter ``init_hidden = True``.
     Forward and backward passes are performed at every time step. Gradients from previous time steps are propagated forward and scaled by the leaky rate.
+    Gradients are cleared after every weight update, so the scaling applies within each window of ``K`` time steps, i.e., the default ``K=1`` reduces to :func:`RTRL`.
+    If a layer has a separate ``beta`` for each neuron, its gradients are scaled by the mean ``beta`` of the layer.
+    As hidden states are detached after every time step, memory usage does not grow with ``num_steps``.
 
     Example::
 
@@ -533,7 +751,7 @@ def BPTF(
         # train_loader is of type torch.utils.data.DataLoader
         # backprop is automatically applied every K=40 time steps
         for epoch in range(5):
-            loss, spk, mem = backprop.BPTF(net, train_loader, num_steps=num_steps,
+            loss = backprop.BPTF(net, train_loader, num_steps=num_steps,
             optimizer=optimizer, criterion=loss_fn, regularization=reg_fn, device=device)
 
 
@@ -565,37 +783,223 @@ def BPTF(
     :type K: int, optional
 
     :return: return average loss for one epoch
-    :rtype: torch.Tensor
+    :rtype: float
+    """
 
-    :return: return output spikes over time
-    :rtype: torch.Tensor
+    return BPTFTrainer(
+        net, num_steps, criterion, time_var, regularization, device, K
+    ).train_epoch(dataloader, optimizer)
 
-    :return: return output membrane potential trace over time
-    :rtype: torch.Tensor
-    """
 
+def _leaky_params(net):
+    """Pairs each neuron in ``net`` with the parameters that drive it, i.e., those registered after the previous neuron, along with its own parameters.
+    Parameters registered after the final neuron are not paired."""
 
-def _rec_trunc(
-    spk,
-    mem,
-    regularization,
-    loss_spk,
-    reg_spk=False,
-    spk_rec_trunc=False,
-    mem_rec_trunc=False,
-):
-    """Creates truncated mem and spk tensors where needed by criterion & regularization."""
+    leaky_params = []
+    params = []
+    for module in net.modules():
+        params += list(module.parameters(recurse=False))
+        if isinstance(module, snn.LIF):
+            leaky_params.append((params, module))
+            params = []
+
+    return leaky_params
+
+
+def _criterion_flags(criterion, regularization):
+    """Returns whether ``criterion`` takes spk (``True``) or mem (``False``), whether its targets are time-varying,
+    whether ``regularization`` takes spk (``True``) or mem (``False``),
+    and whether ``criterion`` and ``regularization`` only depend on the spike count summed over time."""
+
+    # element 1: if true: spk, if false, mem
+    # element 2: if true: time_varying_targets
+    # element 3: if true: only depends on the spike count
+
+    criterion_dict = {
+        "mse_membrane_loss": [
+            False,
+            True,
+            False,
+        ],  # if time_var_target is true, need a flag to let mse_mem_loss know when to re-start iterating targets from
+        "ce_max_membrane_loss": [False, False, False],
+        "ce_rate_loss": [True, False, False],
+        "ce_count_loss": [True, False, True],
+        "mse_count_loss": [True, False, True],
+    }  # note: when using mse_count_loss, the target spike-count should be for a truncated time, not for the full time
+
+    reg_dict = {"l1_rate_sparsity": [True, True]}
+
+    # acc_dict = {
+    #     SF.accuracy_rate : [False, False, False, True]
+    # }
+
+    try:
+        # m: mem, s: spk // s: every step, e: end
+        loss_spk, time_var_targets, loss_count = criterion_dict[
+            getattr(criterion, "__name__", None)
+        ]
+    except KeyError:
+        raise TypeError(
+            "``criterion`` must be one of the loss functions in ``snntorch.functional``: e.g., 'mse_membrane_loss', 'ce_max_membrane_loss', 'ce_rate_loss' etc."
+        )
+    if time_var_targets:
+        time_var_targets = criterion.time_var_targets  # check this
 
+    reg_spk, reg_count = False, False
     if regularization:
-        if loss_spk and reg_spk:
-            spk_rec_trunc.append(spk)
-        if loss_spk != reg_spk:
-            spk_rec_trunc.append(spk)
-            mem_rec_trunc.append(mem)
-        else:
-            mem_rec_trunc.append(mem)
+        try:
+            reg_spk, reg_count = reg_dict[getattr(regularization, "__name__", None)]
+        except KeyError:
+            raise TypeError(
+                "``regularization`` must be one of the regularization functions in ``snntorch.functional``: e.g., 'l1_rate_sparsity'."
+            )
+
+    return loss_spk, time_var_targets, reg_spk, loss_count, reg_count
+
+
+def _split_static(net):
+    """Splits a Sequential ``net`` at the first layer containing a neuron into the layers ahead of it, which give the same output at every time step for time-static data, and the remaining layers.
+    Returns ``(None, net)`` if ``net`` cannot be split safely, e.g., if a layer ahead of the first neuron is stochastic or tracks running statistics."""
+
+    if not isinstance(net, nn.Sequential):
+        return None, net
+
+    for idx, module in enumerate(net):
+        # a neuron nested in a block, e.g., a conv block, must also run at every step
+        submodules = list(module.modules())
+        if any(isinstance(m, snn.LIF) for m in submodules):
+            break
+        if any(
+            isinstance(
+                m, (nn.modules.dropout._DropoutNd, nn.modules.batchnorm._BatchNorm)
+            )
+            for m in submodules
+        ):
+            return None, net
     else:
-        if loss_spk:  # risk: removing option for losses with both mem and spk
-            spk_rec_trunc.append(spk)
-        else:
-            mem_rec_trunc.append(mem)
+        return None, net
+
+    if idx == 0:
+        return None, net
+
+    return net[:idx], net[idx:]
+
+
+def _make_forward(net, num_return, time_var):
+    """Returns a function mapping ``(data, step)`` to the output spikes and membrane potential of ``net``."""
+
+    if num_return < 2:
+        raise TypeError(
+            "The final layer of ``net`` must be an snntorch neuron with ``output=True``."
+        )
+
+    # spk is always the first output and mem the last, regardless of num_return
+    if time_var:
+
+        def forward(data, step):
+            out = net(data[step])
+            return out[0], out[-1]
+
+    else:
+
+        def forward(data, step):
+            out = net(data)
+            return out[0], out[-1]
+
+    return forward
+
+
+def _make_loss(criterion, loss_spk, time_var_targets, spike_count=False):
+    """Returns a function computing ``criterion`` over a truncated window of ``count`` time steps of recorded spk or mem.
+    Time-varying targets are expected to be pre-split into windows, and are indexed by ``K_count``.
+    If ``spike_count=True``, the recorded spk is the spike count summed over the window."""
+
+    if spike_count and loss_spk:
+
+        def loss_fn(spk_rec, mem_rec, targets, K_count, count):
+            return criterion._spike_count_loss(spk_rec, targets, count)
+
+    elif time_var_targets:
+
+        def loss_fn(spk_rec, mem_rec, targets, K_count, count):
+            return criterion(spk_rec if loss_spk else mem_rec, targets[K_count])
+
+    else:
+
+        def loss_fn(spk_rec, mem_rec, targets, K_count, count):
+            return criterion(spk_rec if loss_spk else mem_rec, targets)
+
+    return loss_fn
+
+
+def _make_reg(regularization, reg_spk):
+    """Returns a function computing the regularization term over a truncated window, or ``0`` if there is none."""
+
+    if not regularization:
+        return lambda spk_rec, mem_rec: 0
+    if reg_spk:
+        return lambda spk_rec, mem_rec: regularization(spk_rec)
+    return lambda spk_rec, mem_rec: regularization(mem_rec)
+
+
+def _autocast(fn, device_type):
+    """Wraps ``fn`` to run under automatic mixed precision on ``device_type``.
+    CUDA autocasts to ``float16``; CPU only supports ``bfloat16``."""
+
+    dtype = torch.float16 if device_type == "cuda" else torch.bfloat16
+
+    def autocast_fn(*args):
+        with torch.autocast(device_type=device_type, dtype=dtype):
+            return fn(*args)
+
+    return autocast_fn
+
+
+def _finalize_window(
+    spk_rec, mem_rec, count, targets, K_count, loss_fn, reg_fn, spike_count=False
+):
+    """Returns the loss over the ``count`` time steps recorded in the current truncated window.
+    The per-step recordings are stacked here, once per window.
+    If ``spike_count=True``, ``spk_rec`` is the spike count summed over the window rather than a recording."""
+
+    # a single stack per window: stack(out=...) does not support autograd,
+    # and cat of unsqueezed tensors performs the same copy as stack
+    if spk_rec is not None and not spike_count:
+        spk_rec = torch.stack(spk_rec)
+    if mem_rec is not None:
+        mem_rec = torch.stack(mem_rec)
+
+    return loss_fn(spk_rec, mem_rec, targets, K_count, count) + reg_fn(
+        spk_rec, mem_rec
+    )
+
+
+def _prefetch(dataloader, device):
+    """Yields ``(data, targets)`` from ``dataloader`` on ``device``.
+    On CUDA, the next batch is copied on a side stream while the current batch is being processed."""
+
+    device = torch.device(device)
+    if device.type != "cuda":
+        for data, targets in dataloader:
+            yield data.to(device), targets.to(device)
+        return
+
+    stream = torch.cuda.Stream(device=device)
+    batch = None
+    for data, targets in dataloader:
+        with torch.cuda.stream(stream):
+            data = data.to(device, non_blocking=True)
+            targets = targets.to(device, non_blocking=True)
+        if batch is not None:
+            yield batch
+
+        # the copy must finish before the batch is consumed on the main stream
+        main_stream = torch.cuda.current_stream(device)
+        main_stream.wait_stream(stream)
+        data.record_stream(main_stream)
+        targets.record_stream(main_stream)
+        batch = data, targets
+
+    if batch is not None:
+        yield batch
+
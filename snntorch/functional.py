@@ -119,14 +119,18 @@ class ce_count_loss(LossFunctions):
         self.__name__ = "ce_count_loss"
 
     def __call__(self, spk_out, targets):
+        return self._spike_count_loss(torch.sum(spk_out, 0), targets, spk_out.size(0))
+
+    def _spike_count_loss(self, spike_count, targets, num_steps):
+        """Applies the loss to the spike count [batch_size x num_outputs] accumulated over ``num_steps`` time steps."""
         log_softmax_fn = nn.LogSoftmax(dim=-1)
         loss_fn = nn.NLLLoss()
 
         if self.population_code:
-            _, _, num_outputs = self._prediction_check(spk_out)
-            spike_count = _population_code(spk_out, self.num_classes, num_outputs)
-        else:
-            spike_count = torch.sum(spk_out, 0)  # B x C
+            num_outputs = spike_count.size(-1)
+            spike_count = _population_code(
+                spike_count.unsqueeze(0), self.num_classes, num_outputs
+            )
         log_p_y = log_softmax_fn(spike_count)
 
         loss = loss_fn(log_p_y, targets)
@@ -205,7 +209,11 @@ class mse_count_loss(LossFunctions):
         self.__name__ = "mse_count_loss"
 
     def __call__(self, spk_out, targets):
-        _, num_steps, num_outputs = self._prediction_check(spk_out)
+        return self._spike_count_loss(torch.sum(spk_out, 0), targets, spk_out.size(0))
+
+    def _spike_count_loss(self, spike_count, targets, num_steps):
+        """Applies the loss to the spike count [batch_size x num_outputs] accumulated over ``num_steps`` time steps."""
+        num_outputs = spike_count.size(-1)
         loss_fn = nn.MSELoss()
 
         if not self.population_code:
@@ -220,8 +228,6 @@ class mse_count_loss(LossFunctions):
                 off_target=off_target,
             )
 
-            spike_count = torch.sum(spk_out, 0)  # B x C
-
         else:
             on_target = int(
                 num_steps * self.correct_rate * (num_outputs / self.num_classes)
@@ -235,7 +241,9 @@ class mse_count_loss(LossFunctions):
                 on_target=on_target,
                 off_target=off_target,
             )
-            spike_count = _population_code(spk_out, self.num_classes, num_outputs)
+            spike_count = _population_code(
+                spike_count.unsqueeze(0), self.num_classes, num_outputs
+            )
 
         loss = loss_fn(spike_count, spike_count_target)
         return loss / num_steps
@@ -1,7 +1,6 @@
 # Note: need NumPy 1.17 or later for RNG functions
 import numpy as np
 import snntorch as snn
-import torch.nn as nn
 
 def data_subset(dataset, subset, idx=0):
     """Partition the dataset by a factor of ``1/subset`` without removing access to data and target attributes.
@@ -135,32 +134,29 @@ def reset(net):
     Reset their hidden parameters to zero and detach them
     from the current computation graph."""
 
-    global is_stein
-    global is_alpha
-    global is_leaky
-    global is_lapicque
-    global is_synaptic
+    neuron_types = _neuron_types(net)
+
+    _layer_check(neuron_types)
+
+    for neuron in neuron_types:
+        neuron.reset_hidden()  # reset hidden state to 0's
+        neuron.detach_hidden()
 
-    is_stein = False
-    is_alpha = False
-    is_leaky = False
-    is_synaptic = False
-    is_lapicque = False
 
-    _layer_check(net=net)
+def _neuron_types(net):
+    """Return the neuron classes contained in net whose hidden states can be reset and detached."""
 
-    _layer_reset()
+    return {
+        type(module)
+        for module in net.modules()
+        if hasattr(type(module), "reset_hidden")
+        and hasattr(type(module), "detach_hidden")
+    }
 
-def _check_layer_exists(net, instance):
-    for layer in net._modules.values():
-        if isinstance(layer, instance):
-            return True
-        if isinstance(layer, nn.ModuleList) or isinstance(layer, nn.Sequential):
-            return _check_layer_exists(layer, instance)
-    return False
 
-def _layer_check(net):
-    """Check for the types of LIF neurons contained in net."""
+def _layer_check(neuron_types):
+    """Set the ``is_*`` flags for the types of LIF neurons in neuron_types.
+    The flags are kept for backwards compatibility; the neuron types are used directly to reset and detach hidden states."""
 
     global is_leaky
     global is_lapicque
@@ -168,30 +164,11 @@ def _layer_check(net):
     global is_stein
     global is_alpha
 
-    is_lapicque = _check_layer_exists(net, snn.Lapicque)
-    is_leaky = _check_layer_exists(net, snn.Leaky)
-    is_synaptic = _check_layer_exists(net, snn.Synaptic)
-    is_stein = _check_layer_exists(net, snn.Stein)
-    is_alpha = _check_layer_exists(net, snn.Alpha)
-
-def _layer_reset():
-    """Reset hidden parameters to zero and detach them from the current computation graph."""
-
-    if is_lapicque:
-        snn.Lapicque.reset_hidden()  # reset hidden state to 0's
-        snn.Lapicque.detach_hidden()
-    if is_synaptic:
-        snn.Synaptic.reset_hidden()  # reset hidden state to 0's
-        snn.Synaptic.detach_hidden()
-    if is_leaky:
-        snn.Leaky.reset_hidden()  # reset hidden state to 0's
-        snn.Leaky.detach_hidden()
-    if is_stein:
-        snn.Stein.reset_hidden()  # reset hidden state to 0's
-        snn.Stein.detach_hidden()
-    if is_alpha:
-        snn.Alpha.reset_hidden()  # reset hidden state to 0's
-        snn.Alpha.detach_hidden()
+    is_lapicque = any(issubclass(neuron, snn.Lapicque) for neuron in neuron_types)
+    is_leaky = any(issubclass(neuron, snn.Leaky) for neuron in neuron_types)
+    is_synaptic = any(issubclass(neuron, snn.Synaptic) for neuron in neuron_types)
+    is_stein = any(issubclass(neuron, snn.Stein) for neuron in neuron_types)
+    is_alpha = any(issubclass(neuron, snn.Alpha) for neuron in neuron_types)
 
 
 def _final_layer_check(net):
@@ -2,12 +2,16 @@
 
 """Tests for `snntorch` package."""
 
+import math
 import pytest
 import snntorch as snn
 import snntorch.backprop as bp
+import snntorch.functional as SF
+from snntorch import surrogate
 from tests.conftest import Net
 from unittest import mock
 import torch
+import torch.nn as nn
 
 device = torch.device("cuda") if torch.cuda.is_available() else torch.device("cpu")
 
@@ -32,3 +36,369 @@ device = torch.device("cuda") if torch.cuda.is_available() else torch.device("cp
 #     )
 
 #     assert loss_avg is not None
+
+
+@pytest.fixture
+def leaky_net():
+    snn.LIF.init()  # clear instances from other tests
+    return nn.Sequential(
+        nn.Linear(2, 3), snn.Leaky(beta=0.5, init_hidden=True, output=True)
+    )
+
+
+@pytest.fixture
+def time_var_loader():
+    # [T x B x dims] data and class targets for a single batch
+    return [(torch.rand(3, 2, 2), torch.tensor([0, 2]))]
+
+
+def test_BPTF(leaky_net, time_var_loader):
+    optimizer = torch.optim.SGD(leaky_net.parameters(), lr=0.1)
+
+    loss_avg = bp.BPTF(
+        leaky_net,
+        time_var_loader,
+        num_steps=3,
+        optimizer=optimizer,
+        criterion=SF.ce_count_loss(),
+        time_var=True,
+        K=2,
+    )
+
+    assert isinstance(loss_avg, float)
+
+
+def test_TBPTTTrainer(leaky_net, time_var_loader):
+    optimizer = torch.optim.SGD(leaky_net.parameters(), lr=0.1)
+    trainer = bp.TBPTTTrainer(
+        leaky_net,
+        num_steps=3,
+        criterion=SF.ce_count_loss(),
+        time_var=True,
+        K=2,
+    )
+
+    # the trainer is reused across epochs
+    for _ in range(2):
+        loss_avg = trainer.train_epoch(time_var_loader, optimizer)
+
+    assert isinstance(loss_avg, float)
+
+
+def _static_net(nested):
+    if nested:
+        return nn.Sequential(
+            nn.Sequential(
+                nn.Flatten(), nn.Linear(4, 6), snn.Leaky(beta=0.5, init_hidden=True)
+            ),
+            nn.Linear(6, 3),
+            snn.Leaky(beta=0.5, init_hidden=True, output=True),
+        )
+    return nn.Sequential(
+        nn.Flatten(),
+        nn.Linear(4, 6),
+        snn.Leaky(beta=0.5, init_hidden=True),
+        nn.Linear(6, 3),
+        snn.Leaky(beta=0.5, init_hidden=True, output=True),
+    )
+
+
+@pytest.mark.parametrize("nested", [False, True])
+def test_TBPTT_static_split(nested):
+    num_steps = 4
+    data = torch.rand(2, 2, 2)
+    targets = torch.tensor([0, 2])
+
+    def train(time_var):
+        snn.LIF.init()
+        torch.manual_seed(0)
+        net = _static_net(nested)
+        optimizer = torch.optim.SGD(net.parameters(), lr=0.5)
+
+        # repeating static data over time disables the static-prefix split
+        x = data.repeat(num_steps, 1, 1, 1) if time_var else data
+        loss_avg = bp.TBPTT(
+            net,
+            [(x, targets)],
+            num_steps=num_steps,
+            optimizer=optimizer,
+            criterion=SF.ce_max_membrane_loss(),
+            time_var=time_var,
+            K=3,
+        )
+        return loss_avg, [param.detach().clone() for param in net.parameters()]
+
+    loss_split, params_split = train(time_var=False)
+    loss_full, params_full = train(time_var=True)
+
+    assert loss_split == pytest.approx(loss_full)
+    for param_split, param_full in zip(params_split, params_full):
+        assert torch.allclose(param_split, param_full, atol=1e-6)
+
+
+def test_split_static_nested_neuron():
+    snn.LIF.init()
+    prefix, _ = bp._split_static(_static_net(nested=True))
+
+    # the first block contains a neuron, so nothing is static
+    assert prefix is None
+
+
+def test_BPTF_leak():
+    snn.LIF.init()
+    torch.manual_seed(0)
+    net = nn.Sequential(
+        nn.Linear(2, 3), snn.Leaky(beta=0.5, init_hidden=True, output=True)
+    )
+    data = torch.rand(2, 2, 2)
+    targets = torch.tensor([0, 2])
+    criterion = SF.ce_max_membrane_loss()
+
+    # gradient of each step's loss alone, with the hidden state detached between steps
+    step_grads = []
+    snn.Leaky.reset_hidden()
+    for step in range(2):
+        net.zero_grad()
+        _, mem = net(data[step])
+        criterion(mem.unsqueeze(0), targets).backward()
+        step_grads.append([param.grad.clone() for param in net.parameters()])
+        snn.Leaky.detach_hidden()
+
+    # record the gradient applied at the update, leaving the weights unchanged
+    update_grads = []
+    optimizer = torch.optim.SGD(net.parameters(), lr=0.1)
+    optimizer.step = lambda: update_grads.append(
+        [param.grad.clone() for param in net.parameters()]
+    )
+
+    bp.BPTF(
+        net,
+        [(data, targets)],
+        num_steps=2,
+        optimizer=optimizer,
+        criterion=criterion,
+        time_var=True,
+        K=2,
+    )
+
+    # the gradient from step 0 reaches the update at the end of the window, scaled by beta
+    assert len(update_grads) == 1
+    for update, grad_0, grad_1 in zip(update_grads[0], *step_grads):
+        assert torch.allclose(update, 0.5 * grad_0 + grad_1)
+
+
+@pytest.mark.parametrize("population_code", [False, True])
+def test_ce_count_loss(population_code):
+    spk_out = torch.rand(3, 2, 4)
+    targets = torch.tensor([0, 1])
+    criterion = SF.ce_count_loss(population_code=population_code, num_classes=2)
+
+    spike_count = spk_out.sum(0)
+    if population_code:  # 2 output neurons per class
+        spike_count = spike_count.view(2, 2, 2).sum(-1)
+    expected = nn.functional.cross_entropy(spike_count, targets)
+
+    assert torch.allclose(criterion(spk_out, targets), expected)
+
+
+def test_mse_count_loss():
+    spk_out = torch.rand(3, 2, 4)
+    targets = torch.tensor([0, 2])
+
+    # the correct class targets a spike at every step
+    spike_count_target = 3 * nn.functional.one_hot(targets, 4).float()
+    expected = nn.functional.mse_loss(spk_out.sum(0), spike_count_target) / 3
+
+    assert torch.allclose(SF.mse_count_loss()(spk_out, targets), expected)
+
+
+@pytest.mark.parametrize(
+    "criterion",
+    [SF.ce_count_loss(), SF.mse_count_loss(population_code=True, num_classes=2)],
+)
+def test_TBPTT_spike_count(criterion):
+    num_steps = 5  # K=2 leaves a tail window of one step
+    data = 2 * torch.rand(num_steps, 2, 2)
+    targets = torch.tensor([0, 1])
+
+    def train(spike_count):
+        snn.LIF.init()
+        torch.manual_seed(0)
+        net = nn.Sequential(
+            nn.Linear(2, 4),
+            snn.Leaky(
+                beta=0.5,
+                spike_grad=surrogate.fast_sigmoid(),
+                init_hidden=True,
+                output=True,
+            ),
+        )
+        optimizer = torch.optim.SGD(net.parameters(), lr=1.0)
+        trainer = bp.TBPTTTrainer(
+            net,
+            num_steps,
+            criterion,
+            time_var=True,
+            regularization=SF.l1_rate_sparsity(Lambda=1e-2),
+            K=2,
+        )
+        assert trainer.count_spk
+
+        if not spike_count:
+            # record every step and apply the criterion to the recording instead
+            trainer.count_spk = False
+            trainer.loss_fn = bp._make_loss(
+                criterion, trainer.loss_spk, trainer.time_var_targets
+            )
+
+        loss_avg = trainer.train_epoch([(data, targets)], optimizer)
+        return loss_avg, [param.detach().clone() for param in net.parameters()]
+
+    loss_count, params_count = train(spike_count=True)
+    loss_rec, params_rec = train(spike_count=False)
+
+    # the updates depend on the gradients of each window
+    assert loss_count == pytest.approx(loss_rec)
+    for param_count, param_rec in zip(params_count, params_rec):
+        assert torch.allclose(param_count, param_rec, atol=1e-6)
+
+
+class _WindowLoss:
+    """Stands in for ``mse_membrane_loss`` with time-varying targets.
+    Returns the mean membrane potential of each window and records the targets it was given."""
+
+    __name__ = "mse_membrane_loss"
+    time_var_targets = True
+
+    def __init__(self):
+        self.targets = []
+
+    def __call__(self, mem_out, targets):
+        self.targets.append(targets.tolist())
+        return mem_out.mean()
+
+
+def test_TBPTT_windows(leaky_net):
+    num_steps = 5  # K=2 leaves a tail window of one step
+    data = torch.rand(num_steps, 2, 2)
+    criterion = _WindowLoss()
+    optimizer = torch.optim.SGD(leaky_net.parameters(), lr=0.0)
+
+    loss_avg = bp.TBPTT(
+        leaky_net,
+        [(data, torch.arange(num_steps))] * 2,
+        num_steps=num_steps,
+        optimizer=optimizer,
+        criterion=criterion,
+        time_var=True,
+        K=2,
+    )
+
+    # the window index restarts with every batch
+    assert criterion.targets == [[0, 1], [2, 3], [4]] * 2
+
+    # each window is weighted by its length and both batches are identical,
+    # so the average loss is the mean over all steps of one batch
+    snn.Leaky.reset_hidden()
+    mem_rec = torch.stack([leaky_net(data[step])[1] for step in range(num_steps)])
+    assert loss_avg == pytest.approx(mem_rec.mean().item(), rel=1e-5)
+
+
+def test_TBPTT_unknown_criterion(leaky_net, time_var_loader):
+    optimizer = torch.optim.SGD(leaky_net.parameters(), lr=0.1)
+
+    with pytest.raises(TypeError):
+        bp.TBPTT(
+            leaky_net,
+            time_var_loader,
+            num_steps=3,
+            optimizer=optimizer,
+            criterion=nn.MSELoss(),
+            time_var=True,
+        )
+
+    with pytest.raises(TypeError):
+        bp.TBPTT(
+            leaky_net,
+            time_var_loader,
+            num_steps=3,
+            optimizer=optimizer,
+            criterion=SF.ce_count_loss(),
+            time_var=True,
+            regularization=nn.MSELoss(),
+        )
+
+
+@pytest.mark.parametrize(
+    "criterion",
+    [
+        SF.mse_membrane_loss(),
+        SF.ce_max_membrane_loss(),
+        SF.ce_rate_loss(),
+        SF.ce_count_loss(),
+        SF.mse_count_loss(),
+    ],
+)
+@pytest.mark.parametrize("method", [bp.TBPTT, bp.BPTF])
+def test_criteria(method, criterion, leaky_net, time_var_loader):
+    optimizer = torch.optim.SGD(leaky_net.parameters(), lr=0.1)
+
+    loss_avg = method(
+        leaky_net,
+        time_var_loader,
+        num_steps=3,
+        optimizer=optimizer,
+        criterion=criterion,
+        time_var=True,
+        K=2,
+    )
+
+    assert isinstance(loss_avg, float)
+
+
+def test_TBPTTTrainer_amp(leaky_net, time_var_loader):
+    params = [param.detach().clone() for param in leaky_net.parameters()]
+    optimizer = torch.optim.SGD(leaky_net.parameters(), lr=0.1)
+
+    # autocasts to bfloat16 on CPU
+    trainer = bp.TBPTTTrainer(
+        leaky_net,
+        num_steps=3,
+        criterion=SF.ce_max_membrane_loss(),
+        time_var=True,
+        K=2,
+        amp=True,
+    )
+    loss_avg = trainer.train_epoch(time_var_loader, optimizer)
+
+    assert isinstance(loss_avg, float)
+    assert math.isfinite(loss_avg)
+    assert any(
+        not torch.equal(param, new_param)
+        for param, new_param in zip(params, leaky_net.parameters())
+    )
+
+
+@pytest.mark.skipif(
+    not hasattr(torch, "compile"), reason="requires PyTorch 2.0 or later"
+)
+def test_TBPTTTrainer_compile():
+    snn.LIF.init()
+    net = _static_net(nested=False)
+    optimizer = torch.optim.SGD(net.parameters(), lr=0.1)
+
+    # the layers after the static prefix are compiled
+    trainer = bp.TBPTTTrainer(
+        net,
+        num_steps=3,
+        criterion=SF.ce_max_membrane_loss(),
+        time_var=False,
+        K=2,
+        compile=True,
+    )
+    loss_avg = trainer.train_epoch(
+        [(torch.rand(2, 2, 2), torch.tensor([0, 2]))], optimizer
+    )
+
+    assert isinstance(loss_avg, float)
+    assert math.isfinite(loss_avg)